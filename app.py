@@ -1,13 +1,18 @@
 import logging
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, time as dt_time, timedelta
 from typing import Any, Dict, List, Optional
 
+import orjson
 import pytz
+from cachetools import TTLCache
 from ratelimit import limits, sleep_and_retry
 
 import requests
+from requests.adapters import HTTPAdapter, Retry
 from alpaca.trading.client import TradingClient
 from alpaca.trading.enums import OrderClass, OrderSide, TimeInForce
 from alpaca.trading.requests import (
@@ -22,6 +27,19 @@ app = FastAPI()
 
 _trading_client: Optional[TradingClient] = None
 _http_session = requests.Session()
+# Keep-alive pool shared by the Finviz scrape and StockData quote lookups, with retries on throttling.
+_http_adapter = HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=8,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=("GET", "HEAD"),
+    ),
+)
+_http_session.mount("https://", _http_adapter)
+_http_session.mount("http://", _http_adapter)
 
 # Configure logging
 logging.basicConfig(
@@ -44,6 +62,12 @@ CALLS_PER_SECOND = 2
 SECONDS_BETWEEN_CALLS = 1
 
 INSIDER_DEFAULT_LIMIT = 100
+QUOTE_LOOKUP_WORKERS = 4
+QUOTE_CACHE_TTL_SECONDS = 60
+
+# Successful quote prices keyed by ticker; the lock is needed because lookups run on a thread pool.
+_quote_cache: TTLCache = TTLCache(maxsize=1024, ttl=QUOTE_CACHE_TTL_SECONDS)
+_quote_cache_lock = threading.Lock()
 
 
 @sleep_and_retry
@@ -55,7 +79,7 @@ def rate_limited_request(session, url, timeout=10, **kwargs):
         logger.warning("HTTP %s from %s; skipping.", response.status_code, url)
         return {}
     response.raise_for_status()
-    return response.json()
+    return orjson.loads(response.content)
 
 
 def _require_env(key: str) -> str:
@@ -79,10 +103,15 @@ def get_recent_insider_trades(limit: int = INSIDER_DEFAULT_LIMIT) -> List[Dict[s
     return fetch_insider_trades(limit=limit, session=_http_session)
 
 
-def calculate_position_size(client: TradingClient, price: float, max_position_pct: float = 0.02) -> int:
+def calculate_position_size(
+    client: TradingClient,
+    price: float,
+    max_position_pct: float = 0.02,
+    equity: Optional[float] = None,
+) -> int:
     try:
-        account = client.get_account()
-        equity = float(account.equity)
+        if equity is None:
+            equity = float(client.get_account().equity)
         max_position_value = equity * max_position_pct
         qty = int(max_position_value / price)
         return max(1, min(qty, 100))  # Minimum 1, maximum 100 shares
@@ -136,6 +165,30 @@ def seconds_until_market_open(now: Optional[datetime] = None) -> int:
     return max(int(delta.total_seconds()), 0)
 
 
+def _fetch_quote_price(ticker: str, stockdata_key: str) -> Optional[float]:
+    with _quote_cache_lock:
+        cached = _quote_cache.get(ticker)
+    if cached is not None:
+        return cached
+
+    try:
+        quote_data = rate_limited_request(
+            _http_session,
+            f"https://api.stockdata.org/v1/data/quote?symbols={ticker}&api_token={stockdata_key}"
+        )
+        data = quote_data.get("data", []) if isinstance(quote_data, dict) else []
+        if not data:
+            raise ValueError("Empty price payload")
+        price = float(data[0]["price"])
+    except Exception as e:
+        logger.warning(f"Could not fetch price for {ticker}: {e}")
+        return None
+
+    with _quote_cache_lock:
+        _quote_cache[ticker] = price
+    return price
+
+
 # === Step 1: Scan insider BUY trades on stocks $1–$10 ===
 def scan_stocks():
     if not is_market_hours():
@@ -154,43 +207,42 @@ def scan_stocks():
         logger.info("No insider trades scraped from Finviz.")
         return []
 
-    seen_symbols: set[str] = set()
-    qualifying = []
-    for entry in insider_trades:
-        if entry.get("transaction", "").lower() != "buy":
-            continue
-        ticker = entry.get("ticker")
-        if not ticker or ticker in seen_symbols:
-            continue
-        seen_symbols.add(ticker)
+    # Unique buy tickers in scrape order.
+    candidates = list(
+        dict.fromkeys(
+            entry["ticker"]
+            for entry in insider_trades
+            if entry.get("ticker") and entry.get("transaction", "").lower() == "buy"
+        )
+    )
 
-        try:
-            quote_data = rate_limited_request(
-                _http_session,
-                f"https://api.stockdata.org/v1/data/quote?symbols={ticker}&api_token={stockdata_key}"
-            )
-            data = quote_data.get("data", []) if isinstance(quote_data, dict) else []
-            if not data:
-                raise ValueError("Empty price payload")
-            price = float(data[0]["price"])
-
-            if 1.0 <= price <= 10.0:
+    qualifying = []
+    # Quote lookups overlap on a few threads; rate_limited_request still caps the call rate.
+    with ThreadPoolExecutor(max_workers=QUOTE_LOOKUP_WORKERS) as executor:
+        prices = executor.map(lambda ticker: _fetch_quote_price(ticker, stockdata_key), candidates)
+        for ticker, price in zip(candidates, prices):
+            if price is not None and 1.0 <= price <= 10.0:
                 qualifying.append({"symbol": ticker, "price": price})
-        except Exception as e:
-            logger.warning(f"Could not fetch price for {ticker}: {e}")
-            continue
 
-        if len(qualifying) >= 25:
-            break
+            if len(qualifying) >= 25:
+                # Drop lookups that have not started yet; we already have enough candidates.
+                executor.shutdown(wait=False, cancel_futures=True)
+                break
 
     logger.info(f"Found {len(qualifying)} qualifying insider-buy stocks.")
     return qualifying
 
 
 # === Step 2: Execute bracket trades ===
-def place_bracket_order(client: TradingClient, symbol: str, price: float, qty: Optional[int] = None):
+def place_bracket_order(
+    client: TradingClient,
+    symbol: str,
+    price: float,
+    qty: Optional[int] = None,
+    equity: Optional[float] = None,
+):
     if qty is None:
-        qty = calculate_position_size(client, price)
+        qty = calculate_position_size(client, price, equity=equity)
 
     take_profit = round(price * 1.05, 2)
     stop_loss = round(price * 0.98, 2)
@@ -230,6 +282,13 @@ def auto_trade():
         logger.warning(f"Could not fetch current positions: {exc}")
         positions = set()
 
+    # Read equity once per cycle instead of once per order; sizing falls back per order if this fails.
+    try:
+        equity: Optional[float] = float(client.get_account().equity)
+    except Exception as exc:
+        logger.warning(f"Could not fetch account equity: {exc}")
+        equity = None
+
     for stock in stocks:
         symbol = stock["symbol"]
         price = stock["price"]
@@ -238,7 +297,7 @@ def auto_trade():
             logger.info(f"🔁 Skipping {symbol} — position already open.")
             continue
 
-        place_bracket_order(client, symbol, price)
+        place_bracket_order(client, symbol, price, equity=equity)
 
 
 # Provide a health endpoint so Railway stops reporting 404 on the root path.
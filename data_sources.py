@@ -1,15 +1,20 @@
 from __future__ import annotations
 
-import json
 import logging
 import os
+import re
+import threading
 import time
-from typing import Dict, Optional
+from html import unescape
+from itertools import islice
+from typing import Any, Dict, List, Optional
 
-import pandas as pd
+import numpy as np
+import orjson
 import requests
 import yfinance as yf
 from bs4 import BeautifulSoup
+from cachetools import TTLCache
 from requests.adapters import HTTPAdapter, Retry
 from requests.exceptions import HTTPError, RequestException, RetryError
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
@@ -19,15 +24,27 @@ LOGGER = logging.getLogger(__name__)
 STOCKDATA_BASE_URL = "https://api.stockdata.org/v1/data/quote"
 FINVIZ_URL = "https://finviz.com/quote.ashx?t={symbol}"
 YAHOO_QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+YAHOO_CHART_URL = "https://{host}/v8/finance/chart/{symbol}"
+# query2 serves the same chart API and is used as the alternate host on retries.
+YAHOO_CHART_HOSTS = ("query1.finance.yahoo.com", "query2.finance.yahoo.com")
+YAHOO_SPARK_URL = "https://query1.finance.yahoo.com/v7/finance/spark"
+YAHOO_SPARK_BATCH_SIZE = 20
+CHART_FIELDS = ("open", "high", "low", "close", "volume")
 
 CHART_THROTTLE_SECONDS = 1.5
 CHART_COOLDOWN_SECONDS = 300
 _rate_limited_until = 0.0
 
+
 # Temporary cache so we do not hammer upstream providers repeatedly within a single run.
-_FUNDAMENTAL_CACHE: Dict[str, Dict] = {}
-_HISTORY_CACHE: Dict[str, Dict] = {}
+# Bounded so long-running workers scanning many tickers do not grow without limit.
 _CACHE_TTL_SECONDS = 300
+_CACHE_MAXSIZE = 1024
+_FUNDAMENTAL_CACHE: TTLCache = TTLCache(maxsize=_CACHE_MAXSIZE, ttl=_CACHE_TTL_SECONDS)
+_HISTORY_CACHE: TTLCache = TTLCache(maxsize=_CACHE_MAXSIZE, ttl=_CACHE_TTL_SECONDS)
+_SENTIMENT_CACHE: TTLCache = TTLCache(maxsize=_CACHE_MAXSIZE, ttl=_CACHE_TTL_SECONDS)
+# TTLCache is not thread-safe and scans fetch symbols from a worker pool.
+_CACHE_LOCK = threading.Lock()
 _WARNED: set[tuple[str, str, str]] = set()
 
 retry_strategy = Retry(
@@ -38,11 +55,27 @@ retry_strategy = Retry(
 )
 
 SESSION = requests.Session()
-ADAPTER = HTTPAdapter(max_retries=retry_strategy)
+# Scans fetch from a worker pool (SCAN_WORKERS in main.py); a larger pool keeps each worker's
+# keep-alive connection instead of discarding overflow connections once 10 are checked out.
+ADAPTER = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry_strategy)
 SESSION.mount("https://", ADAPTER)
 SESSION.mount("http://", ADAPTER)
 
 FINVIZ_HEADERS = {"User-Agent": "Mozilla/5.0"}
+FINVIZ_SNAPSHOT_FIELDS = frozenset({"Price", "P/E", "Market Cap", "Volume"})
+FINVIZ_HEADLINE_LIMIT = 5
+FINVIZ_MULTIPLIERS = {"K": 1_000, "M": 1_000_000, "B": 1_000_000_000}
+# Headlines are pulled straight from the page bytes; building a DOM for five strings is wasteful.
+FINVIZ_HEADLINE_RE = re.compile(rb'class="[^"]*\bnews-link-left\b[^"]*"[^>]*>(.*?)</div>', re.DOTALL)
+HTML_TAG_RE = re.compile(rb"<[^>]+>")
+# One alternation classifies both polarities in a single scan. Matches are substrings (not
+# word-bounded) to keep the original keyword semantics; the zero-width lookahead tests every
+# offset, so a keyword overlapping one of the other polarity (e.g. "lossurge") is still seen.
+SENTIMENT_KEYWORD_RE = re.compile("(?=(?P<positive>up|gain|surge|upgrade)|(?P<negative>down|drop|loss|downgrade))")
+YAHOO_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+PriceHistory = Dict[str, np.ndarray]
 
 
 class DataFetchError(RuntimeError):
@@ -63,12 +96,33 @@ def is_rate_limited() -> bool:
     return _is_rate_limited()
 
 
+def has_cached_data(symbol: str) -> bool:
+    """Report whether fundamentals, history and sentiment for ``symbol`` are all still cached."""
+    with _CACHE_LOCK:
+        return symbol in _FUNDAMENTAL_CACHE and symbol in _HISTORY_CACHE and symbol in _SENTIMENT_CACHE
+
+
+def cached_fundamentals(symbol: str) -> Optional[Dict]:
+    """Return the cached fundamentals for ``symbol`` without going upstream; None when not cached."""
+    return _cache_get(_FUNDAMENTAL_CACHE, symbol)
+
+
+def _cache_get(cache: TTLCache, symbol: str) -> Any:
+    with _CACHE_LOCK:
+        return cache.get(symbol)
+
+
+def _cache_set(cache: TTLCache, symbol: str, data: Any) -> None:
+    with _CACHE_LOCK:
+        cache[symbol] = data
+
+
 def _log_warning(symbol: str, reason: str, source: str) -> None:
     key = (symbol, reason, source)
     if key in _WARNED:
         return
     _WARNED.add(key)
-    LOGGER.warning(json.dumps({"symbol": symbol, "reason": reason, "source": source}))
+    LOGGER.warning(orjson.dumps({"symbol": symbol, "reason": reason, "source": source}).decode())
 
 
 @retry(  # type: ignore
@@ -82,7 +136,7 @@ def _fetch_yahoo(symbol: str) -> Dict:
         raise DataFetchError("Yahoo temporarily rate limited")
 
     try:
-        ticker = yf.Ticker(symbol)
+        ticker = yf.Ticker(symbol, session=SESSION)
         info = getattr(ticker, "fast_info", None) or {}
         price = info.get("last_price") or info.get("last_price_usd") or info.get("previous_close")
         market_cap = info.get("market_cap")
@@ -132,14 +186,33 @@ def _fetch_yahoo(symbol: str) -> Dict:
         raise DataFetchError(str(exc))
 
 
+def _parse_finviz_number(value: str) -> Optional[float]:
+    """Parse a Finviz snapshot value such as "1,234", "5.6M" or "-"; None when it is not numeric."""
+    value = value.replace(",", "")
+    multiplier = FINVIZ_MULTIPLIERS.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    try:
+        return float(value) * multiplier
+    except ValueError:
+        return None
+
+
 def _fetch_finviz(symbol: str) -> Optional[Dict]:
     try:
-        html = SESSION.get(FINVIZ_URL.format(symbol=symbol), headers=FINVIZ_HEADERS, timeout=10).text
+        html = SESSION.get(FINVIZ_URL.format(symbol=symbol), headers=FINVIZ_HEADERS, timeout=10).content
         soup = BeautifulSoup(html, "html.parser")
         cells = soup.select("table.snapshot-table2 td")
         if not cells:
             return None
-        data = {cells[i].get_text(strip=True): cells[i + 1].get_text(strip=True) for i in range(0, len(cells) - 1, 2)}
+        data = {}
+        for i in range(0, len(cells) - 1, 2):
+            label = cells[i].get_text(strip=True)
+            if label not in FINVIZ_SNAPSHOT_FIELDS:
+                continue
+            data[label] = cells[i + 1].get_text(strip=True)
+            if len(data) == len(FINVIZ_SNAPSHOT_FIELDS):
+                break
         price_text = data.get("Price")
         pe_text = data.get("P/E")
         mcap_text = data.get("Market Cap")
@@ -148,21 +221,10 @@ def _fetch_finviz(symbol: str) -> Optional[Dict]:
         if not price_text or not mcap_text:
             return None
 
-        def _parse_float(value: str) -> Optional[float]:
-            value = value.replace(",", "")
-            multipliers = {"K": 1_000, "M": 1_000_000, "B": 1_000_000_000}
-            suffix = value[-1]
-            if suffix in multipliers:
-                return float(value[:-1]) * multipliers[suffix]
-            try:
-                return float(value)
-            except ValueError:
-                return None
-
-        price = _parse_float(price_text)
-        mcap = _parse_float(mcap_text)
-        pe_ratio = _parse_float(pe_text) if pe_text else None
-        volume = _parse_float(volume_text) if volume_text else 0.0
+        price = _parse_finviz_number(price_text)
+        mcap = _parse_finviz_number(mcap_text)
+        pe_ratio = _parse_finviz_number(pe_text) if pe_text else None
+        volume = _parse_finviz_number(volume_text) if volume_text else 0.0
 
         if price is None or mcap is None:
             return None
@@ -191,7 +253,7 @@ def _fetch_stockdata(symbol: str) -> Optional[Dict]:
             timeout=10,
         )
         resp.raise_for_status()
-        data = resp.json().get("data", [])
+        data = orjson.loads(resp.content).get("data", [])
         if not data:
             return None
         quote = data[0]
@@ -209,7 +271,7 @@ def _fetch_stockdata(symbol: str) -> Optional[Dict]:
             "volume": float(volume) if volume is not None else 0.0,
             "source": "stockdata",
         }
-    except RequestException as exc:
+    except (RequestException, ValueError) as exc:
         _log_warning(symbol, f"stockdata_error:{exc}", "stockdata")
         return None
 
@@ -222,7 +284,7 @@ def _fetch_yahoo_quote(symbol: str) -> Optional[Dict]:
             timeout=10,
         )
         resp.raise_for_status()
-        results = resp.json().get("quoteResponse", {}).get("result", [])
+        results = orjson.loads(resp.content).get("quoteResponse", {}).get("result", [])
         if not results:
             return None
         quote = results[0]
@@ -240,60 +302,92 @@ def _fetch_yahoo_quote(symbol: str) -> Optional[Dict]:
             "volume": float(volume),
             "source": "yahoo_quote",
         }
-    except RequestException as exc:
+    except (RequestException, ValueError) as exc:
         _log_warning(symbol, f"yahoo_quote_error:{exc}", "yahoo_quote")
         return None
 
 
-def _download_yfinance(symbol: str, interval: str, period: str) -> pd.DataFrame:
-    """Return price history from yfinance; raise DataFetchError when unavailable."""
+def _fetch_chart(symbol: str, interval: str, period: str, host: str = YAHOO_CHART_HOSTS[0]) -> PriceHistory:
+    """Return OHLCV arrays from Yahoo's chart JSON endpoint; raise DataFetchError when unavailable."""
     if _is_rate_limited():
         raise DataFetchError("Yahoo temporarily rate limited")
 
+    resp = SESSION.get(
+        YAHOO_CHART_URL.format(host=host, symbol=symbol),
+        params={"interval": interval, "range": period},
+        headers=YAHOO_HEADERS,
+        timeout=10,
+    )
+    resp.raise_for_status()
+    results = (orjson.loads(resp.content).get("chart") or {}).get("result") or []
+    if not results:
+        raise DataFetchError("Empty price history")
+
+    return _chart_arrays(results[0])
+
+
+def _chart_arrays(result: Dict) -> PriceHistory:
+    """Convert one chart/spark result to float64 arrays, dropping bars with any missing field.
+
+    Only the fields Yahoo returned are kept, alongside the bar timestamps in epoch seconds.
+    """
+    if not isinstance(result, dict):
+        raise DataFetchError("Malformed price history")
+    timestamps = result.get("timestamp") or []
+    indicators = result.get("indicators") or {}
+    if not isinstance(indicators, dict):
+        raise DataFetchError("Malformed price history")
+    quotes = indicators.get("quote") or [{}]
+    if not timestamps:
+        raise DataFetchError("Empty price history")
+
+    quote = quotes[0] if isinstance(quotes, list) else None
+    if not isinstance(quote, dict):
+        raise DataFetchError("Malformed price history")
     try:
-        df = yf.download(
-            symbol,
-            interval=interval,
-            period=period,
-            progress=False,
-            threads=False,
-        )
-        if df is None or df.empty:
-            raise DataFetchError("Empty price history")
-        return df
-    except Exception as exc:
-        message = str(exc)
-        if "429" in message or "Too Many Requests" in message:
-            _mark_rate_limited()
-        raise DataFetchError(message)
+        # None entries (missing bars) become NaN under the float64 dtype.
+        history = {field: np.asarray(quote[field], dtype=np.float64) for field in CHART_FIELDS if field in quote}
+        bar_times = np.asarray(timestamps, dtype=np.int64)
+    except (TypeError, ValueError) as exc:
+        raise DataFetchError(f"Malformed price history: {exc}") from exc
+    # Every field must line up with the timestamps; a ragged payload cannot be masked bar by bar.
+    if bar_times.ndim != 1 or any(values.shape != bar_times.shape for values in history.values()):
+        raise DataFetchError("Price history fields do not match timestamps")
+
+    complete = np.ones(bar_times.shape, dtype=bool)
+    for values in history.values():
+        complete &= np.isfinite(values)
+    history = {field: values[complete] for field, values in history.items()}
+    history["timestamp"] = bar_times[complete]
+    return history
 
 
 def fetch_fundamentals(symbol: str) -> Optional[Dict]:
-    cached = _FUNDAMENTAL_CACHE.get(symbol)
-    if cached and time.time() - cached["timestamp"] < _CACHE_TTL_SECONDS:
-        return cached["data"]
+    cached = _cache_get(_FUNDAMENTAL_CACHE, symbol)
+    if cached is not None:
+        return cached
 
     try:
         yahoo_data = _fetch_yahoo(symbol)
         if yahoo_data:
-            _FUNDAMENTAL_CACHE[symbol] = {"data": yahoo_data, "timestamp": time.time()}
+            _cache_set(_FUNDAMENTAL_CACHE, symbol, yahoo_data)
             return yahoo_data
     except DataFetchError as exc:
         _log_warning(symbol, f"yahoo_failure:{exc}", "yahoo")
 
     finviz_data = _fetch_finviz(symbol)
     if finviz_data:
-        _FUNDAMENTAL_CACHE[symbol] = {"data": finviz_data, "timestamp": time.time()}
+        _cache_set(_FUNDAMENTAL_CACHE, symbol, finviz_data)
         return finviz_data
 
     stockdata = _fetch_stockdata(symbol)
     if stockdata:
-        _FUNDAMENTAL_CACHE[symbol] = {"data": stockdata, "timestamp": time.time()}
+        _cache_set(_FUNDAMENTAL_CACHE, symbol, stockdata)
         return stockdata
 
     yahoo_quote = _fetch_yahoo_quote(symbol)
     if yahoo_quote:
-        _FUNDAMENTAL_CACHE[symbol] = {"data": yahoo_quote, "timestamp": time.time()}
+        _cache_set(_FUNDAMENTAL_CACHE, symbol, yahoo_quote)
         return yahoo_quote
 
     _log_warning(symbol, "missing fundamentals", "all")
@@ -301,25 +395,41 @@ def fetch_fundamentals(symbol: str) -> Optional[Dict]:
 
 
 def get_sentiment(symbol: str) -> str:
+    """Classify recent Finviz headlines; results are cached for the shared TTL."""
+    cached = _cache_get(_SENTIMENT_CACHE, symbol)
+    if cached is not None:
+        return cached
+
     try:
-        html = SESSION.get(FINVIZ_URL.format(symbol=symbol), headers=FINVIZ_HEADERS, timeout=10).text
-        soup = BeautifulSoup(html, "html.parser")
-        headlines = [node.get_text(strip=True).lower() for node in soup.select(".news-link-left")][:5]
-        if any(word in headline for headline in headlines for word in ("up", "gain", "surge", "upgrade")):
-            return "Positive"
-        if any(word in headline for headline in headlines for word in ("down", "drop", "loss", "downgrade")):
-            return "Negative"
-        return "Neutral"
+        resp = SESSION.get(FINVIZ_URL.format(symbol=symbol), headers=FINVIZ_HEADERS, timeout=10)
+        # A 403/404 block page has no headlines; it must not be cached as "Neutral".
+        resp.raise_for_status()
+        matches = islice(FINVIZ_HEADLINE_RE.finditer(resp.content), FINVIZ_HEADLINE_LIMIT)
+        headlines = "\n".join(
+            unescape(HTML_TAG_RE.sub(b"", match.group(1)).decode("utf-8", "ignore")).strip().lower()
+            for match in matches
+        )
+        # Any positive keyword wins, so stop at the first one; a negative hit only counts otherwise.
+        sentiment = "Neutral"
+        for match in SENTIMENT_KEYWORD_RE.finditer(headlines):
+            if match.lastgroup == "positive":
+                sentiment = "Positive"
+                break
+            sentiment = "Negative"
     except Exception as exc:
+        # Leave failures uncached so the next scan retries.
         _log_warning(symbol, f"sentiment_error:{exc}", "finviz")
         return "Neutral"
 
+    _cache_set(_SENTIMENT_CACHE, symbol, sentiment)
+    return sentiment
 
-def get_price_history(symbol: str, interval: str = "1h", period: str = "5d") -> Optional[pd.DataFrame]:
-    cached = _HISTORY_CACHE.get(symbol)
-    now = time.time()
-    if cached and now - cached["timestamp"] < _CACHE_TTL_SECONDS:
-        return cached["data"]
+
+def get_price_history(symbol: str, interval: str = "1h", period: str = "5d") -> Optional[PriceHistory]:
+    """Return float64 arrays keyed by field ("close", "volume", ...; "timestamp" for real bars)."""
+    cached = _cache_get(_HISTORY_CACHE, symbol)
+    if cached is not None:
+        return cached
 
     cooldown_multiplier = 1
 
@@ -330,11 +440,11 @@ def get_price_history(symbol: str, interval: str = "1h", period: str = "5d") ->
             time.sleep(min(sleep_for, CHART_COOLDOWN_SECONDS))
 
         try:
-            df = _download_yfinance(symbol, interval, period)
-            df = df.dropna()
-            if not df.empty:
-                _HISTORY_CACHE[symbol] = {"data": df, "timestamp": now}
-                return df
+            host = YAHOO_CHART_HOSTS[attempt % len(YAHOO_CHART_HOSTS)]
+            history = _fetch_chart(symbol, interval, period, host=host)
+            if history["timestamp"].size:
+                _cache_set(_HISTORY_CACHE, symbol, history)
+                return history
         except DataFetchError:
             pass
         except RetryError:
@@ -359,8 +469,64 @@ def get_price_history(symbol: str, interval: str = "1h", period: str = "5d") ->
     fundamentals = fetch_fundamentals(symbol)
     if fundamentals and fundamentals.get("price"):
         price = fundamentals["price"]
-        df = pd.DataFrame({"Close": [price], "Volume": [fundamentals.get("volume", 0.0)]})
-        _HISTORY_CACHE[symbol] = {"data": df, "timestamp": now}
-        return df
+        history = {
+            "close": np.array([price], dtype=np.float64),
+            "volume": np.array([fundamentals.get("volume", 0.0)], dtype=np.float64),
+        }
+        _cache_set(_HISTORY_CACHE, symbol, history)
+        return history
 
     return None
+
+
+def prefetch_price_history(symbols: List[str], interval: str = "1h", period: str = "5d") -> None:
+    """Warm the history cache with batched Yahoo spark requests (closes only, 20 symbols per call).
+
+    Symbols the batch cannot fill are left for get_price_history's per-symbol path.
+    """
+    pending = [symbol for symbol in dict.fromkeys(symbols) if _cache_get(_HISTORY_CACHE, symbol) is None]
+
+    for start in range(0, len(pending), YAHOO_SPARK_BATCH_SIZE):
+        if _is_rate_limited():
+            return
+        chunk = pending[start : start + YAHOO_SPARK_BATCH_SIZE]
+        try:
+            resp = SESSION.get(
+                YAHOO_SPARK_URL,
+                params={"symbols": ",".join(chunk), "interval": interval, "range": period},
+                headers=YAHOO_HEADERS,
+                timeout=10,
+            )
+            resp.raise_for_status()
+            payload = orjson.loads(resp.content)
+        except RetryError:
+            # Same cooldown as get_price_history, so the per-symbol paths stop hitting Yahoo too.
+            LOGGER.warning("Yahoo rate limit hit during batched history fetch")
+            _mark_rate_limited()
+            return
+        except HTTPError as exc:
+            if getattr(exc.response, "status_code", None) == 429:
+                LOGGER.warning("HTTP 429 during batched history fetch")
+                _mark_rate_limited()
+                return
+            LOGGER.warning("Batched history fetch failed for %s: %s", ",".join(chunk), exc)
+            return
+        except (RequestException, ValueError) as exc:
+            LOGGER.warning("Batched history fetch failed for %s: %s", ",".join(chunk), exc)
+            return
+
+        spark = payload.get("spark") if isinstance(payload, dict) else None
+        results = spark.get("result") if isinstance(spark, dict) else None
+        for item in results if isinstance(results, list) else []:
+            if not isinstance(item, dict):
+                continue
+            symbol = item.get("symbol")
+            responses = item.get("response")
+            if symbol not in chunk or not isinstance(responses, list) or not responses:
+                continue
+            try:
+                history = _chart_arrays(responses[0])
+            except DataFetchError:
+                continue
+            if history["timestamp"].size:
+                _cache_set(_HISTORY_CACHE, symbol, history)
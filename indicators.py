@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is an optional accelerator; fall back to plain Python.
+
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+
+        return decorator
+
+
+@njit(cache=True)
+def fused_indicators(values: np.ndarray, window: int = 90, min_length: int = 30) -> tuple[float, float, float]:
+    """Walk the closes once, updating EMA-9, EMA-21 and the 14-bar RSI sums together.
+
+    Only the last ``window`` closes are used; shorter histories are padded up to
+    ``min_length`` by repeating the final close, without materialising the padding.
+    """
+    n = values.shape[0]
+    start = max(0, n - window)
+    count = n - start
+    total = max(count, min_length)
+    last = values[n - 1]
+
+    alpha9 = 2 / (9 + 1)
+    alpha21 = 2 / (21 + 1)
+    ema9 = ema21 = values[start]
+    gain = loss = 0.0
+    rsi_start = total - 14
+    prev = values[start]
+    for i in range(1, total):
+        close = values[start + i] if i < count else last
+        # Skip the update when equal, as pandas' ewm does, so flat series stay exact.
+        if close != ema9:
+            ema9 = (1 - alpha9) * ema9 + alpha9 * close
+        if close != ema21:
+            ema21 = (1 - alpha21) * ema21 + alpha21 * close
+        if i >= rsi_start:
+            delta = close - prev
+            if delta > 0:
+                gain += delta
+            else:
+                loss -= delta
+        prev = close
+
+    # Simple (not Wilder) averages over the last 14 deltas; both share the /14 so it cancels.
+    if loss == 0:
+        rsi_value = 50.0
+    else:
+        rsi_value = 100 - (100 / (1 + gain / loss))
+    return ema9, ema21, rsi_value
@@ -1,24 +1,72 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
 import os
+import threading
 import time
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, NamedTuple, Optional
 
-import pandas as pd
+import numpy as np
+import orjson
+from cachetools import TTLCache
 from fastapi import FastAPI, Query, Response
-
-from data_sources import fetch_fundamentals, get_price_history, get_sentiment, is_rate_limited
+from fastapi.responses import ORJSONResponse
+
+from data_sources import (
+    cached_fundamentals,
+    fetch_fundamentals,
+    get_price_history,
+    get_sentiment,
+    has_cached_data,
+    is_rate_limited,
+    prefetch_price_history,
+)
+from indicators import fused_indicators
 from trade_engine import TradeEngine
 
-app = FastAPI(title="Microcap Scout v2", version="3.2.0")
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    task = asyncio.create_task(_prewarm_loop()) if PREWARM_INTERVAL_SECONDS > 0 else None
+    yield
+    if task:
+        task.cancel()
+
+
+app = FastAPI(
+    title="Microcap Scout v2",
+    version="3.2.0",
+    default_response_class=ORJSONResponse,
+    lifespan=_lifespan,
+)
 logging.basicConfig(level=logging.INFO)
 LOGGER = logging.getLogger(__name__)
 
 CACHE_TTL = 300
 SYMBOL_DELAY_SECONDS = float(os.getenv("SYMBOL_DELAY_SECONDS", "2"))
-_cache: dict[str, dict] = {}
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "4"))
+DEFAULT_TICKERS = "CEI,BBIG,COSM,GNS,SOBR"
+# Entries expire after CACHE_TTL; re-running the warm-up every minute refetches only what expired.
+PREWARM_INTERVAL_SECONDS = float(os.getenv("PREWARM_INTERVAL_SECONDS", "60"))
+
+
+class _History(NamedTuple):
+    closes: np.ndarray
+    last_bar: Optional[int]
+
+
+class _IndicatorEntry(NamedTuple):
+    key: tuple
+    indicators: dict
+
+
+# Bounded per-symbol caches; the lock is needed because scans fill them from worker threads.
+_CACHE_LOCK = threading.Lock()
+_cache: TTLCache = TTLCache(maxsize=256, ttl=CACHE_TTL)
+_indicator_cache: TTLCache = TTLCache(maxsize=256, ttl=CACHE_TTL)
 START_TIME = time.time()
 
 engine = TradeEngine(
@@ -33,48 +81,30 @@ engine = TradeEngine(
 )
 
 
-def cached_history(symbol: str) -> Optional[pd.Series]:
-    entry = _cache.get(symbol)
-    now = time.time()
-    if entry and now - entry["timestamp"] < CACHE_TTL:
-        return entry["series"]
+def cached_history(symbol: str) -> Optional[_History]:
+    with _CACHE_LOCK:
+        history = _cache.get(symbol)
+    if history is not None:
+        return history
 
-    df = get_price_history(symbol)
-    if df is None or df.empty:
+    prices = get_price_history(symbol)
+    closes = prices.get("close") if prices else None
+    if closes is None or closes.size == 0:
         return None
 
-    closes = df["Close"].dropna()
-    if closes.empty:
-        return None
-
-    series = closes.tail(120)
-    _cache[symbol] = {"series": series, "timestamp": now}
-    return series
-
+    # Keep only the recent closes and the last bar's timestamp; the other fields are not needed downstream.
+    timestamps = prices.get("timestamp")
+    last_bar = int(timestamps[-1]) if timestamps is not None else None
+    history = _History(closes[-120:], last_bar)
+    with _CACHE_LOCK:
+        _cache[symbol] = history
+    return history
 
-def _compute_indicators(close_series: pd.Series) -> dict:
-    closes = close_series.tail(90)
-    if closes.empty:
-        closes = pd.Series([close_series.iloc[-1]])
 
-    if closes.size < 30:
-        closes = pd.concat(
-            [closes, pd.Series([closes.iloc[-1]] * (30 - closes.size))], ignore_index=True
-        )
-
-    ema9 = closes.ewm(span=9, adjust=False).mean().iloc[-1]
-    ema21 = closes.ewm(span=21, adjust=False).mean().iloc[-1]
+def _compute_indicators(closes: np.ndarray) -> dict:
+    ema9, ema21, rsi_value = fused_indicators(closes)
     trend = "Bullish" if ema9 > ema21 else "Bearish"
 
-    delta = closes.diff()
-    gain = delta.clip(lower=0).rolling(window=14, min_periods=14).mean()
-    loss = -delta.clip(upper=0).rolling(window=14, min_periods=14).mean()
-    if loss.iloc[-1] == 0 or pd.isna(loss.iloc[-1]):
-        rsi_value = 50.0
-    else:
-        rs = gain.iloc[-1] / loss.iloc[-1]
-        rsi_value = 100 - (100 / (1 + rs))
-
     return {
         "ema9": float(ema9),
         "ema21": float(ema21),
@@ -83,73 +113,147 @@ def _compute_indicators(close_series: pd.Series) -> dict:
     }
 
 
+def cached_indicators(symbol: str, history: _History) -> dict:
+    # The last bar identifies the history; unchanged closes reuse the previous indicators.
+    closes = history.closes
+    key = (history.last_bar, float(closes[-1]), closes.size)
+    with _CACHE_LOCK:
+        entry = _indicator_cache.get(symbol)
+    if entry and entry.key == key:
+        return entry.indicators
+
+    indicators = _compute_indicators(closes)
+    with _CACHE_LOCK:
+        _indicator_cache[symbol] = _IndicatorEntry(key, indicators)
+    return indicators
+
+
+def _passes_screen(fundamentals: dict) -> bool:
+    """Microcap screen: complete fundamentals, market cap at most $500M and volume of 300k or more."""
+    market_cap = fundamentals.get("market_cap")
+    if fundamentals.get("price") is None or market_cap is None:
+        return False
+    return market_cap <= 500_000_000 and fundamentals.get("volume", 0) >= 300_000
+
+
+def _scan_symbol(symbol: str) -> Optional[tuple[float, dict]]:
+    """Fetch data and indicators for one symbol; returns the unrounded price and its result row."""
+    fundamentals = fetch_fundamentals(symbol)
+    if not fundamentals:
+        LOGGER.warning(orjson.dumps({"symbol": symbol, "reason": "missing fundamentals"}).decode())
+        return None
+
+    price = fundamentals.get("price")
+    market_cap = fundamentals.get("market_cap")
+    volume = fundamentals.get("volume", 0)
+
+    if price is None or market_cap is None:
+        LOGGER.warning(orjson.dumps({"symbol": symbol, "reason": "incomplete fundamentals"}).decode())
+        return None
+
+    if not _passes_screen(fundamentals):
+        return None
+
+    history = cached_history(symbol)
+    synthetic_history = False
+    if history is None:
+        synthetic_history = True
+        history = _History(np.full(30, price, dtype="float64"), None)
+
+    indicators = cached_indicators(symbol, history)
+    trend = indicators["trend"]
+    rsi_value = indicators["rsi"]
+    sentiment = get_sentiment(symbol)
+
+    action = "hold"
+    if rsi_value < 40:
+        action = "watch"
+    elif rsi_value > 55:
+        action = "buy"
+
+    return price, {
+        "symbol": symbol,
+        "market_cap": market_cap,
+        "volume": volume,
+        "price": round(price, 4),
+        "trend": trend,
+        "rsi": rsi_value,
+        "sentiment": sentiment,
+        "action": action,
+        "synthetic_history": synthetic_history,
+        "fundamentals_source": fundamentals.get("source"),
+        "trade": None,
+    }
+
+
+def _needs_upstream(symbol: str) -> bool:
+    """Whether scanning ``symbol`` would call a data provider, judged from the caches alone."""
+    fundamentals = cached_fundamentals(symbol)
+    if fundamentals is not None and not _passes_screen(fundamentals):
+        # Screened-out symbols return before history or sentiment are fetched.
+        return False
+    return not has_cached_data(symbol)
+
+
+def _collect(symbols: List[str]) -> List[tuple[float, dict]]:
+    """Scan ``symbols`` on the worker pool without trading; returns (price, row) in symbol order."""
+    # One batched request per 20 symbols instead of one chart request each.
+    # Only symbols already known to pass the screen get batched history; the rest fetch it
+    # per symbol after screening, so rejected symbols still never request history.
+    screened = [symbol for symbol in symbols if (data := cached_fundamentals(symbol)) and _passes_screen(data)]
+    with _CACHE_LOCK:
+        stale = [symbol for symbol in screened if symbol not in _cache]
+    prefetch_price_history(stale)
+
+    futures = []
+    workers = max(1, min(SCAN_WORKERS, len(symbols)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Symbols still start SYMBOL_DELAY_SECONDS apart; the pool only overlaps their I/O.
+        for idx, symbol in enumerate(symbols):
+            if is_rate_limited():
+                LOGGER.warning("Rate limit active; stopping scan early")
+                break
+
+            # Symbols answered from the caches make no upstream calls, so they need no throttle.
+            if SYMBOL_DELAY_SECONDS > 0 and idx != 0 and _needs_upstream(symbol):
+                time.sleep(SYMBOL_DELAY_SECONDS)
+
+            futures.append(executor.submit(_scan_symbol, symbol))
+
+    return [scanned for future in futures if (scanned := future.result()) is not None]
+
+
 def analyze(symbols: List[str]) -> List[dict]:
     results = []
-
-    for idx, symbol in enumerate(symbols):
-        if is_rate_limited():
-            LOGGER.warning("Rate limit active; stopping scan early")
-            break
-
-        if SYMBOL_DELAY_SECONDS > 0 and idx != 0:
-            time.sleep(SYMBOL_DELAY_SECONDS)
-
-        fundamentals = fetch_fundamentals(symbol)
-        if not fundamentals:
-            LOGGER.warning(json.dumps({"symbol": symbol, "reason": "missing fundamentals"}))
-            continue
-
-        price = fundamentals.get("price")
-        market_cap = fundamentals.get("market_cap")
-        volume = fundamentals.get("volume", 0)
-
-        if price is None or market_cap is None:
-            LOGGER.warning(json.dumps({"symbol": symbol, "reason": "incomplete fundamentals"}))
-            continue
-
-        if market_cap > 500_000_000 or volume < 300_000:
-            continue
-
-        closes = cached_history(symbol)
-        synthetic_history = False
-        if closes is None:
-            synthetic_history = True
-            closes = pd.Series([price] * 30)
-
-        indicators = _compute_indicators(closes)
-        trend = indicators["trend"]
-        rsi_value = indicators["rsi"]
-        sentiment = get_sentiment(symbol)
-
-        action = "hold"
-        if rsi_value < 40:
-            action = "watch"
-        elif rsi_value > 55:
-            action = "buy"
-
-        trade_info = None
-        if action == "buy":
-            trade_info = engine.attempt_trade(symbol, price)
-
-        results.append(
-            {
-                "symbol": symbol,
-                "market_cap": market_cap,
-                "volume": volume,
-                "price": round(price, 4),
-                "trend": trend,
-                "rsi": rsi_value,
-                "sentiment": sentiment,
-                "action": action,
-                "synthetic_history": synthetic_history,
-                "fundamentals_source": fundamentals.get("source"),
-                "trade": trade_info,
-            }
-        )
+    # Trades run serially in symbol order so the engine's daily limits apply as before.
+    for price, row in _collect(symbols):
+        if row["action"] == "buy":
+            row["trade"] = engine.attempt_trade(row["symbol"], price)
+        results.append(row)
 
     return results
 
 
+async def _prewarm_loop() -> None:
+    """Keep the data caches for the default tickers warm so /scan and /products.json rarely go upstream.
+
+    Only data is refreshed; trades are still evaluated by the request that asks for them.
+    """
+    while True:
+        if not is_rate_limited():
+            symbols = _parse_symbols(os.getenv("SCAN_TICKERS", DEFAULT_TICKERS))
+            try:
+                await asyncio.to_thread(_collect, symbols)
+            except Exception as exc:
+                LOGGER.warning("Cache prewarm failed: %s", exc)
+        await asyncio.sleep(PREWARM_INTERVAL_SECONDS)
+
+
+def _parse_symbols(raw: str) -> List[str]:
+    # Upper-case, drop blanks and duplicates while keeping the caller's order.
+    return list(dict.fromkeys(s.strip().upper() for s in raw.split(",") if s.strip()))
+
+
 @app.get("/")
 def health_check():
     return {"status": "ok"}
@@ -174,8 +278,7 @@ def status():
 def products():
     if is_rate_limited():
         return {"message": "Data temporarily rate limited", "results": []}
-    symbols = os.getenv("SCAN_TICKERS", "CEI,BBIG,COSM,GNS,SOBR").split(",")
-    symbols = [s.strip().upper() for s in symbols if s.strip()]
+    symbols = _parse_symbols(os.getenv("SCAN_TICKERS", DEFAULT_TICKERS))
     summary = analyze(symbols)
     if not summary:
         return {"message": "Data unavailable", "results": []}
@@ -186,11 +289,7 @@ def products():
 def scan(tickers: Optional[str] = Query(None, description="Comma separated tickers")):
     if is_rate_limited():
         return {"message": "Data temporarily rate limited", "results": []}
-    if tickers:
-        symbols = [s.strip().upper() for s in tickers.split(",") if s.strip()]
-    else:
-        symbols = os.getenv("SCAN_TICKERS", "CEI,BBIG,COSM,GNS,SOBR").split(",")
-        symbols = [s.strip().upper() for s in symbols if s.strip()]
+    symbols = _parse_symbols(tickers or os.getenv("SCAN_TICKERS", DEFAULT_TICKERS))
     summary = analyze(symbols)
     if not summary:
         return {"message": "Data unavailable", "results": []}
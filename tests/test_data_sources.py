@@ -0,0 +1,128 @@
+from unittest import mock
+
+import orjson
+import pytest
+from requests.exceptions import HTTPError, RetryError
+
+import data_sources
+from data_sources import DataFetchError, _chart_arrays, get_sentiment, prefetch_price_history
+
+
+class _Response:
+    def __init__(self, payload, status_code=200):
+        self.content = payload if isinstance(payload, bytes) else orjson.dumps(payload)
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError(f"{self.status_code} error", response=self)
+
+
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch):
+    for cache in (data_sources._FUNDAMENTAL_CACHE, data_sources._HISTORY_CACHE, data_sources._SENTIMENT_CACHE):
+        cache.clear()
+    monkeypatch.setattr(data_sources, "_rate_limited_until", 0.0)
+
+
+def _chart(closes, timestamps=None, **extra):
+    timestamps = timestamps if timestamps is not None else list(range(1, len(closes) + 1))
+    return {"timestamp": timestamps, "indicators": {"quote": [{"close": closes, **extra}]}}
+
+
+def test_chart_arrays_drops_incomplete_bars():
+    history = _chart_arrays(_chart([1.0, None, 3.0], volume=[10, 20, None]))
+
+    assert history["close"].tolist() == [1.0]
+    assert history["volume"].tolist() == [10.0]
+    assert history["timestamp"].tolist() == [1]
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        _chart([1.0, 2.0], timestamps=[1, 2, 3]),
+        _chart([1.0, 2.0, 3.0], volume=[1, 2]),
+        _chart(["a", "b"]),
+        {"timestamp": {"a": 1}, "indicators": {"quote": [{"close": [1.0]}]}},
+        {"timestamp": [1], "indicators": ["x"]},
+        {"timestamp": [1], "indicators": {"quote": "x"}},
+        {"timestamp": [1], "indicators": {"quote": [None]}},
+        {"timestamp": []},
+        "junk",
+    ],
+)
+def test_chart_arrays_rejects_malformed_results(result):
+    with pytest.raises(DataFetchError):
+        _chart_arrays(result)
+
+
+def test_prefetch_skips_malformed_spark_entries():
+    good = {"symbol": "AAA", "response": [_chart([1.0, 2.0, 3.0])]}
+    payload = {
+        "spark": {
+            "result": [
+                None,
+                good,
+                {"symbol": "BBB", "response": [_chart([1.0, 2.0], timestamps=[1, 2, 3])]},
+                {"symbol": "CCC", "response": [{"timestamp": [1], "indicators": ["x"]}]},
+                {"symbol": "DDD", "response": {"0": "x"}},
+                {"symbol": "EEE", "response": "x"},
+                {"symbol": "ZZZ", "response": [_chart([1.0])]},
+            ]
+        }
+    }
+    with mock.patch.object(data_sources.SESSION, "get", return_value=_Response(payload)):
+        prefetch_price_history(["AAA", "BBB", "CCC", "DDD", "EEE"])
+
+    assert list(data_sources._HISTORY_CACHE) == ["AAA"]
+    assert data_sources._HISTORY_CACHE["AAA"]["close"].tolist() == [1.0, 2.0, 3.0]
+
+
+@pytest.mark.parametrize("payload", [[1, 2], {"spark": ["x"]}, {"spark": {"result": "x"}}, b"not json"])
+def test_prefetch_tolerates_malformed_payloads(payload):
+    with mock.patch.object(data_sources.SESSION, "get", return_value=_Response(payload)):
+        prefetch_price_history(["AAA"])
+
+    assert not data_sources._HISTORY_CACHE
+
+
+@pytest.mark.parametrize(
+    "failure",
+    [RetryError("too many 429 error responses"), HTTPError("429", response=_Response({}, status_code=429))],
+)
+def test_prefetch_starts_cooldown_when_throttled(failure):
+    symbols = [f"S{i}" for i in range(data_sources.YAHOO_SPARK_BATCH_SIZE + 1)]
+    with mock.patch.object(data_sources.SESSION, "get", side_effect=failure) as get:
+        prefetch_price_history(symbols)
+
+    assert data_sources.is_rate_limited()
+    assert get.call_count == 1
+
+
+def test_prefetch_other_http_errors_do_not_start_cooldown():
+    with mock.patch.object(data_sources.SESSION, "get", return_value=_Response({}, status_code=500)):
+        prefetch_price_history(["AAA"])
+
+    assert not data_sources.is_rate_limited()
+    assert not data_sources._HISTORY_CACHE
+
+
+def _finviz_page(*headlines):
+    rows = "".join(f'<div class="news-link-left"><a>{headline}</a></div>' for headline in headlines)
+    return f"<html><body>{rows}</body></html>".encode()
+
+
+def test_sentiment_is_cached_on_success():
+    with mock.patch.object(data_sources.SESSION, "get", return_value=_Response(_finviz_page("Shares surge"))):
+        assert get_sentiment("AAA") == "Positive"
+
+    assert data_sources._SENTIMENT_CACHE["AAA"] == "Positive"
+
+
+@pytest.mark.parametrize("status_code", [403, 404])
+def test_sentiment_block_pages_are_not_cached(status_code):
+    with mock.patch.object(data_sources.SESSION, "get", return_value=_Response(b"<html></html>", status_code)):
+        assert get_sentiment("AAA") == "Neutral"
+
+    assert "AAA" not in data_sources._SENTIMENT_CACHE
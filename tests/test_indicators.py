@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import fused_indicators
+
+
+def _pandas_indicators(values: np.ndarray) -> tuple[float, float, float]:
+    """The pandas ewm/rolling implementation the kernel replaced, kept as the reference."""
+    close_series = pd.Series(values)
+    closes = close_series.tail(90)
+    if closes.size < 30:
+        closes = pd.concat([closes, pd.Series([closes.iloc[-1]] * (30 - closes.size))], ignore_index=True)
+
+    ema9 = closes.ewm(span=9, adjust=False).mean().iloc[-1]
+    ema21 = closes.ewm(span=21, adjust=False).mean().iloc[-1]
+
+    delta = closes.diff()
+    gain = delta.clip(lower=0).rolling(window=14, min_periods=14).mean()
+    loss = -delta.clip(upper=0).rolling(window=14, min_periods=14).mean()
+    if loss.iloc[-1] == 0 or pd.isna(loss.iloc[-1]):
+        rsi_value = 50.0
+    else:
+        rsi_value = 100 - (100 / (1 + gain.iloc[-1] / loss.iloc[-1]))
+    return float(ema9), float(ema21), float(rsi_value)
+
+
+def _assert_matches(values: np.ndarray) -> None:
+    # Summation order differs from pandas' rolling mean, so allow last-bit rounding noise.
+    expected = _pandas_indicators(values)
+    actual = fused_indicators(values)
+    assert actual == pytest.approx(expected, rel=1e-12, abs=1e-9)
+
+
+@pytest.mark.parametrize("length", range(1, 121))
+def test_matches_pandas_on_random_walks(length):
+    rng = np.random.default_rng(length)
+    for _ in range(20):
+        values = np.abs(5 + np.cumsum(rng.normal(0, 0.1, length)))
+        _assert_matches(values)
+
+
+@pytest.mark.parametrize("length", [1, 14, 29, 30, 90, 120])
+def test_flat_series_is_exact(length):
+    values = np.full(length, 3.0)
+    ema9, ema21, rsi = fused_indicators(values)
+    assert (ema9, ema21, rsi) == (3.0, 3.0, 50.0)
+    assert (ema9, ema21, rsi) == _pandas_indicators(values)
+
+
+def test_rsi_is_neutral_when_window_has_no_losses():
+    # Earlier drops leave the 14-bar window, so the loss average must be zero, not rounding residue.
+    values = np.concatenate([np.linspace(9.0, 1.3, 40), np.linspace(1.4, 4.7, 30)])
+    _assert_matches(values)
+    assert fused_indicators(values)[2] == 50.0
+
+
+def test_ignores_closes_before_the_window():
+    rng = np.random.default_rng(7)
+    recent = 5 + np.cumsum(rng.normal(0, 0.1, 90))
+    with_prefix = np.concatenate([np.full(50, 1000.0), recent])
+    assert fused_indicators(with_prefix) == fused_indicators(recent)
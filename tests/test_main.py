@@ -0,0 +1,126 @@
+from unittest import mock
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+import data_sources
+import main
+
+FUNDAMENTALS = {
+    "AAA": {"price": 2.0, "market_cap": 50_000_000.0, "volume": 1_000_000.0},
+    "BBB": {"price": 3.0, "market_cap": 80_000_000.0, "volume": 900_000.0},
+    # Fails the microcap screen, so it must never request history or sentiment.
+    "BIG": {"price": 4.0, "market_cap": 2_000_000_000.0, "volume": 5_000_000.0},
+}
+
+# Alternating +0.2/-0.1 moves give an RSI of about 67, so every screened symbol is a "buy".
+CLOSES = [10.0 + (0.1 * (i // 2) + (0.2 if i % 2 else 0.0)) for i in range(60)]
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.content = payload if isinstance(payload, bytes) else orjson.dumps(payload)
+
+    def raise_for_status(self):
+        pass
+
+
+def _chart(symbol):
+    return {
+        "symbol": symbol,
+        "timestamp": list(range(len(CLOSES))),
+        "indicators": {"quote": [{"close": CLOSES, "volume": [1_000] * len(CLOSES)}]},
+    }
+
+
+def _fake_get(url, params=None, **_kwargs):
+    if url == data_sources.YAHOO_SPARK_URL:
+        symbols = params["symbols"].split(",")
+        return _Response({"spark": {"result": [{"symbol": s, "response": [_chart(s)]} for s in symbols]}})
+    if "/v8/finance/chart/" in url:
+        return _Response({"chart": {"result": [_chart(url.rsplit("/", 1)[1])]}})
+    if url.startswith("https://finviz.com/"):
+        return _Response(b'<div class="news-link-left"><a>Shares surge</a></div>')
+    raise AssertionError(f"unexpected request to {url}")
+
+
+def _fake_fundamentals(symbol):
+    return {"symbol": symbol, "pe_ratio": None, "source": "yahoo", **FUNDAMENTALS[symbol]}
+
+
+@pytest.fixture
+def network(monkeypatch):
+    for cache in (
+        main._cache,
+        main._indicator_cache,
+        data_sources._FUNDAMENTAL_CACHE,
+        data_sources._HISTORY_CACHE,
+        data_sources._SENTIMENT_CACHE,
+    ):
+        cache.clear()
+    monkeypatch.setattr(data_sources, "_rate_limited_until", 0.0)
+    monkeypatch.setattr(data_sources, "_fetch_yahoo", _fake_fundamentals)
+    monkeypatch.setattr(main, "PREWARM_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(main, "SYMBOL_DELAY_SECONDS", 2.0)
+    sleeps = []
+    monkeypatch.setattr(main.time, "sleep", sleeps.append)
+    get = mock.Mock(side_effect=_fake_get)
+    monkeypatch.setattr(data_sources.SESSION, "get", get)
+    return get, sleeps
+
+
+def _history_requests(get):
+    symbols = []
+    for call in get.call_args_list:
+        url, params = call.args[0], call.kwargs.get("params") or {}
+        if url == data_sources.YAHOO_SPARK_URL:
+            symbols += params["symbols"].split(",")
+        elif "/v8/finance/chart/" in url:
+            symbols.append(url.rsplit("/", 1)[1])
+    return symbols
+
+
+def test_scan_dedupes_and_keeps_symbol_order(network):
+    with TestClient(main.app) as client:
+        response = client.get("/scan", params={"tickers": "bbb,aaa,AAA,big"})
+
+    assert response.status_code == 200
+    rows = response.json()["results"]
+    assert [row["symbol"] for row in rows] == ["BBB", "AAA"]
+    assert all(row["action"] == "buy" and row["trade"] is not None for row in rows)
+
+
+def test_collect_places_no_trades(network):
+    with mock.patch.object(main.engine, "attempt_trade") as attempt_trade:
+        scanned = main._collect(["AAA", "BBB"])
+
+    assert [row["symbol"] for _price, row in scanned] == ["AAA", "BBB"]
+    assert all(row["trade"] is None for _price, row in scanned)
+    attempt_trade.assert_not_called()
+
+
+def test_warm_symbols_skip_the_delay(network):
+    get, sleeps = network
+    main._collect(["AAA", "BBB", "BIG"])
+    assert sleeps.count(main.SYMBOL_DELAY_SECONDS) == 2
+
+    sleeps.clear()
+    calls_before = get.call_count
+    main._collect(["AAA", "BBB", "BIG"])
+
+    assert main.SYMBOL_DELAY_SECONDS not in sleeps
+    assert get.call_count == calls_before
+
+
+def test_screened_out_symbols_never_request_history(network):
+    get, _sleeps = network
+    main._collect(["AAA", "BIG"])
+    main._collect(["AAA", "BIG"])
+
+    history_symbols = _history_requests(get)
+    assert "AAA" in history_symbols
+    assert "BIG" not in history_symbols
+    assert not any("BIG" in call.args[0] for call in get.call_args_list)
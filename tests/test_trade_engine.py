@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+import trade_engine
+from trade_engine import POSITIONS_CACHE_SECONDS, TradeEngine
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(trade_engine.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    monkeypatch.setenv("APCA_API_KEY_ID", "key")
+    monkeypatch.setenv("APCA_API_SECRET_KEY", "secret")
+    monkeypatch.setattr(trade_engine, "REST", mock.MagicMock())
+    engine = TradeEngine(
+        daily_budget=10_000,
+        per_trade_budget=1_000,
+        max_trades=10,
+        stop_loss_percent=0.05,
+        take_profit_percent=0.10,
+        max_positions=2,
+        drawdown_limit_percent=0.10,
+        pnl_log_file=str(tmp_path / "pnl.json"),
+    )
+    engine.api.get_account.return_value = SimpleNamespace(equity="10000", last_equity="10000")
+    yield engine
+    engine.close()
+
+
+def test_second_trade_in_window_counts_the_first(engine, clock):
+    engine.api.list_positions.return_value = [object()]
+
+    assert engine.attempt_trade("AAA", 5.0)["status"] == "order placed"
+    result = engine.attempt_trade("BBB", 5.0)
+
+    assert result["error"] == "Max concurrent positions reached"
+    assert engine.api.list_positions.call_count == 1
+    assert engine.api.submit_order.call_count == 1
+
+
+def test_count_is_refetched_after_ttl(engine, clock):
+    engine.api.list_positions.return_value = [object()]
+    assert engine.attempt_trade("AAA", 5.0)["status"] == "order placed"
+
+    # The first order was filled and closed; Alpaca now reports a single open position again.
+    clock[0] += POSITIONS_CACHE_SECONDS + 0.1
+    assert engine.attempt_trade("BBB", 5.0)["status"] == "order placed"
+    assert engine.api.list_positions.call_count == 2
+
+
+def test_failed_fetch_does_not_poison_cache(engine, clock):
+    engine.api.list_positions.side_effect = RuntimeError("boom")
+    assert engine.attempt_trade("AAA", 5.0)["status"] == "order placed"
+
+    # Still inside the window, but nothing was cached, so the next trade asks Alpaca again.
+    engine.api.list_positions.side_effect = None
+    engine.api.list_positions.return_value = [object(), object()]
+    result = engine.attempt_trade("BBB", 5.0)
+
+    assert result["error"] == "Max concurrent positions reached"
+    assert engine.api.list_positions.call_count == 2
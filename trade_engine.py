@@ -1,20 +1,36 @@
 from __future__ import annotations
 
-import json
+import atexit
 import logging
 import os
-from datetime import date, datetime
-from typing import Optional
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timezone
+from typing import BinaryIO, Optional
 
+import orjson
 from alpaca_trade_api import REST
 
 LOGGER = logging.getLogger(__name__)
 
+# How long an open-position count from Alpaca is trusted before _can_trade asks again.
+POSITIONS_CACHE_SECONDS = 2.0
+
 
 def _bool_env(name: str, default: str = "false") -> bool:
     return os.getenv(name, default).lower() in {"1", "true", "yes", "on"}
 
 
+@dataclass(slots=True)
+class TradeStats:
+    date: str
+    used_capital: float = 0.0
+    trades: int = 0
+    pnl: float = 0.0
+    stopped: bool = False
+
+
 class TradeEngine:
     def __init__(
         self,
@@ -46,28 +62,22 @@ class TradeEngine:
             LOGGER.warning("Alpaca credentials missing – trading disabled")
             self.api = None
 
-        self.trade_stats = {
-            "date": str(date.today()),
-            "used_capital": 0.0,
-            "trades": 0,
-            "pnl": 0.0,
-            "stopped": False,
-        }
+        self.trade_stats = TradeStats(date=str(date.today()))
+        # The PnL log is opened on first write and kept open; the lock covers concurrent requests.
+        self._pnl_fp: Optional[BinaryIO] = None
+        self._pnl_lock = threading.Lock()
+        atexit.register(self.close)
+        # (monotonic fetch time, open position count); -inf forces a fetch on the first trade.
+        self._positions_cache: tuple[float, int] = (float("-inf"), 0)
 
     def reset_if_new_day(self) -> None:
         today = str(date.today())
-        if self.trade_stats["date"] != today:
+        if self.trade_stats.date != today:
             LOGGER.info("Resetting daily trade statistics")
-            self.trade_stats = {
-                "date": today,
-                "used_capital": 0.0,
-                "trades": 0,
-                "pnl": 0.0,
-                "stopped": False,
-            }
+            self.trade_stats = TradeStats(date=today)
 
     def get_status(self) -> dict:
-        status = dict(self.trade_stats)
+        status = asdict(self.trade_stats)
         if self.api:
             try:
                 account = self.api.get_account()
@@ -82,33 +92,44 @@ class TradeEngine:
         try:
             account = self.api.get_account()
             daily_pnl = float(account.equity) - float(account.last_equity)
-            self.trade_stats["pnl"] = daily_pnl
+            self.trade_stats.pnl = daily_pnl
             if daily_pnl < -self.daily_budget * self.drawdown_limit_percent:
-                self.trade_stats["stopped"] = True
+                self.trade_stats.stopped = True
                 LOGGER.info("Trading stopped because drawdown exceeded limit")
 
             entry = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "stats": self.trade_stats.copy(),
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "stats": asdict(self.trade_stats),
             }
-            with open(self.pnl_log_file, "a", encoding="utf-8") as f:
-                json.dump(entry, f)
-                f.write("\n")
+            line = orjson.dumps(entry) + b"\n"
+            with self._pnl_lock:
+                if self._pnl_fp is None:
+                    self._pnl_fp = open(self.pnl_log_file, "ab", buffering=65536)
+                self._pnl_fp.write(line)
+                # Trades are infrequent, so flush each entry to keep the log intact if the process dies.
+                self._pnl_fp.flush()
         except Exception as exc:
             LOGGER.warning("PnL logging failed: %s", exc)
 
+    def close(self) -> None:
+        with self._pnl_lock:
+            if self._pnl_fp is not None:
+                self._pnl_fp.close()
+                self._pnl_fp = None
+
     def _can_trade(self, trade_value: float) -> Optional[dict]:
-        if self.trade_stats["stopped"]:
-            return {"error": "Daily drawdown limit reached", "stats": self.trade_stats}
-        if self.trade_stats["trades"] >= self.max_trades:
-            return {"error": "Daily trade count exceeded", "stats": self.trade_stats}
-        if self.trade_stats["used_capital"] + trade_value > self.daily_budget:
-            return {"error": "Daily limit reached", "stats": self.trade_stats}
+        if self.trade_stats.stopped:
+            return {"error": "Daily drawdown limit reached", "stats": asdict(self.trade_stats)}
+        if self.trade_stats.trades >= self.max_trades:
+            return {"error": "Daily trade count exceeded", "stats": asdict(self.trade_stats)}
+        if self.trade_stats.used_capital + trade_value > self.daily_budget:
+            return {"error": "Daily limit reached", "stats": asdict(self.trade_stats)}
         if self.api:
             try:
-                positions = self.api.list_positions()
-                if len(positions) >= self.max_positions:
-                    return {"error": "Max concurrent positions reached", "stats": self.trade_stats}
+                if time.monotonic() - self._positions_cache[0] > POSITIONS_CACHE_SECONDS:
+                    self._positions_cache = (time.monotonic(), len(self.api.list_positions()))
+                if self._positions_cache[1] >= self.max_positions:
+                    return {"error": "Max concurrent positions reached", "stats": asdict(self.trade_stats)}
             except Exception as exc:
                 LOGGER.warning("Could not fetch positions: %s", exc)
         return None
@@ -121,7 +142,7 @@ class TradeEngine:
         qty = max(1, int(self.per_trade_budget // price))
         trade_value = price * qty
         if qty <= 0 or trade_value > self.per_trade_budget:
-            return {"error": "Trade value exceeds per-trade budget", "stats": self.trade_stats}
+            return {"error": "Trade value exceeds per-trade budget", "stats": asdict(self.trade_stats)}
 
         rejection = self._can_trade(trade_value)
         if rejection:
@@ -146,8 +167,11 @@ class TradeEngine:
             LOGGER.error("Trade failed for %s: %s", symbol, exc)
             return {"error": str(exc)}
 
-        self.trade_stats["used_capital"] += trade_value
-        self.trade_stats["trades"] += 1
+        self.trade_stats.used_capital += trade_value
+        self.trade_stats.trades += 1
+        # Count the new position until the next refresh instead of asking Alpaca again.
+        fetched_at, open_positions = self._positions_cache
+        self._positions_cache = (fetched_at, open_positions + 1)
         self._log_pnl()
 
         return {
@@ -157,5 +181,5 @@ class TradeEngine:
             "price": round(price, 4),
             "take_profit": tp,
             "stop_loss": sl,
-            "stats": self.trade_stats,
+            "stats": asdict(self.trade_stats),
         }